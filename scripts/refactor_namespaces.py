@@ -19,36 +19,180 @@ Target mapping:
   src/server/systems/   -> mmo::server::systems
 """
 
+import functools
+import hashlib
+import json
+import mmap
 import os
 import re
 import shutil
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 SRC = os.path.join(os.path.dirname(__file__), '..', 'src')
 SRC = os.path.normpath(SRC)
 ROOT = os.path.normpath(os.path.join(SRC, '..'))
+SRC_PREFIX = SRC + os.sep
+# Digest of every source file as Phase 2 left it, so re-runs only touch files
+# that changed since
+CACHE_PATH = os.path.join(ROOT, '.refactor_cache.json')
 
 
-def path_to_namespace(filepath: str) -> str:
-    """Determine the target namespace for a file based on its directory."""
-    rel = os.path.relpath(filepath, SRC)
-    parts = rel.replace('\\', '/').split('/')
-    # Remove filename
-    dirs = parts[:-1]
-    if not dirs:
+def src_relpath(filepath: str) -> str:
+    """Path of a file relative to src/.
+
+    Paths from the source scan all start with SRC_PREFIX, so a slice does what
+    os.path.relpath would without normalizing both paths on every call.
+    """
+    if filepath.startswith(SRC_PREFIX):
+        return filepath[len(SRC_PREFIX):]
+    return os.path.relpath(filepath, SRC)
+
+
+# Status lines are collected here and written out once per phase, rather than
+# one write per changed file
+LOG: list[str] = []
+
+
+def log(msg: str):
+    """Queue a status line for the next flush_log()."""
+    LOG.append(msg)
+
+
+def flush_log():
+    """Write out everything logged since the last flush in one go."""
+    if LOG:
+        sys.stdout.write('\n'.join(LOG) + '\n')
+        LOG.clear()
+    sys.stdout.flush()
+
+
+# Target namespace per source directory, filled in by the source scan
+DIR_TO_NS: dict[str, str] = {}
+
+
+def dir_to_namespace(dirpath: str) -> str:
+    """Determine the target namespace for a directory under src/."""
+    if dirpath == SRC:
         return 'mmo'
     # Map directory path to namespace
+    dirs = src_relpath(dirpath).replace('\\', '/').split('/')
     return 'mmo::' + '::'.join(dirs)
 
 
-def get_all_sources() -> list[str]:
-    """Get all .hpp and .cpp files under src/."""
-    sources = []
-    for dirpath, _, filenames in os.walk(SRC):
-        for f in filenames:
-            if f.endswith(('.hpp', '.cpp')):
-                sources.append(os.path.join(dirpath, f))
-    return sorted(sources)
+def path_to_namespace(filepath: str) -> str:
+    """Determine the target namespace for a file based on its directory."""
+    dirpath = os.path.dirname(filepath)
+    ns = DIR_TO_NS.get(dirpath)
+    if ns is None:
+        ns = DIR_TO_NS[dirpath] = dir_to_namespace(dirpath)
+    return ns
+
+
+# Directories never worth descending into when scanning the tree: VCS data,
+# build trees (including CLion's cmake-build-*), tool caches and vendored code
+SKIP_DIRS = {'.git', '.cache', 'build', 'node_modules', 'third_party'}
+SKIP_DIR_PREFIXES = ('cmake-build-',)
+
+
+def scan_tree(dirpath: str):
+    """Walk the tree once, yielding ('src', path) for .hpp/.cpp files under src/
+    and ('cmake', path) for every CMakeLists.txt."""
+    in_src = dirpath == SRC or dirpath.startswith(SRC_PREFIX)
+    if in_src:
+        DIR_TO_NS[dirpath] = dir_to_namespace(dirpath)
+    with os.scandir(dirpath) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in SKIP_DIRS and not entry.name.startswith(SKIP_DIR_PREFIXES):
+                    yield from scan_tree(entry.path)
+            elif entry.name == 'CMakeLists.txt':
+                yield 'cmake', entry.path
+            elif in_src and entry.name.endswith(('.hpp', '.cpp')):
+                yield 'src', entry.path
+
+
+def get_all_files() -> tuple[list[str], list[str]]:
+    """Get all .hpp and .cpp files under src/ and all CMakeLists.txt files.
+
+    Call only after src/common has been renamed; the lists are shared by every phase.
+    """
+    found = {'src': [], 'cmake': []}
+    for kind, path in scan_tree(ROOT):
+        found[kind].append(path)
+    return sorted(found['src']), sorted(found['cmake'])
+
+
+def file_contains(filepath: str, needle: bytes) -> bool:
+    """Check whether a file contains needle by scanning it mapped, without reading it in."""
+    with open(filepath, 'rb') as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return mm.find(needle) >= 0
+        except ValueError:
+            # Empty files cannot be mapped
+            return False
+
+
+def replace_in_file(filepath: str, old: bytes, new: bytes) -> bool:
+    """Replace old with new throughout a file. Returns whether the file changed.
+
+    Works on the raw bytes; every replacement here is plain ASCII, so there is
+    no need to decode and re-encode the file.
+    """
+    # Most files have no match, so check before reading them in
+    if not file_contains(filepath, old):
+        return False
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    new_data = data.replace(old, new)
+    if new_data == data:
+        return False
+    with open(filepath, 'wb') as f:
+        f.write(new_data)
+    return True
+
+
+def sub_in_file(filepath: str, pattern: re.Pattern, subs: dict[bytes, bytes]) -> bool:
+    """Apply several substitutions to a file in a single pass over its bytes.
+
+    pattern is the alternation of the keys of subs. Returns whether the file changed.
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    new_data = pattern.sub(lambda m: subs[m.group(0)], data)
+    if new_data == data:
+        return False
+    with open(filepath, 'wb') as f:
+        f.write(new_data)
+    return True
+
+
+# Plain file I/O releases the GIL, so threads are enough to overlap it
+IO_WORKERS = 8
+
+
+def map_files(ex, fn, paths: list[str], *args):
+    """Run fn(path, *args) for every path on ex, yielding (path, result) in order.
+
+    Unlike Executor.map, a failing file does not hide the others: every task
+    still runs, each failure is logged, and the first error is raised once the
+    successful results have all been yielded, so callers log everything that
+    was already written to disk.
+    """
+    futures = [ex.submit(fn, path, *rest) for path, *rest in zip(paths, *args)]
+    error = None
+    for path, future in zip(paths, futures):
+        try:
+            result = future.result()
+        except Exception as e:
+            log(f"  FAILED: {os.path.relpath(path, ROOT)}: {e}")
+            if error is None:
+                error = e
+            continue
+        yield path, result
+    if error is not None:
+        raise error
 
 
 # ---- Phase 1: Rename src/common -> src/protocol ----
@@ -57,60 +201,57 @@ def rename_common_to_protocol():
     common_dir = os.path.join(SRC, 'common')
     protocol_dir = os.path.join(SRC, 'protocol')
     if os.path.isdir(common_dir) and not os.path.isdir(protocol_dir):
-        print(f"Renaming {common_dir} -> {protocol_dir}")
+        log(f"Renaming {common_dir} -> {protocol_dir}")
         shutil.move(common_dir, protocol_dir)
     elif os.path.isdir(protocol_dir):
-        print("src/protocol/ already exists, skipping rename")
+        log("src/protocol/ already exists, skipping rename")
     else:
-        print("WARNING: src/common/ not found")
+        log("WARNING: src/common/ not found")
+
+
+def update_file_includes(filepath: str) -> bool:
+    """Rewrite "common/ includes in one file."""
+    return replace_in_file(filepath, b'"common/', b'"protocol/')
 
 
-def update_includes_common_to_protocol():
+def update_includes_common_to_protocol(sources: list[str]):
     """Replace all #include "common/..." with #include "protocol/..." """
-    for filepath in get_all_sources():
-        with open(filepath, 'r') as f:
-            content = f.read()
-        new_content = content.replace('"common/', '"protocol/')
-        if new_content != content:
-            print(f"  Updated includes: {os.path.relpath(filepath, ROOT)}")
-            with open(filepath, 'w') as f:
-                f.write(new_content)
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as ex:
+        for filepath, changed in map_files(ex, update_file_includes, sources):
+            if changed:
+                log(f"  Updated includes: {os.path.relpath(filepath, ROOT)}")
+
+
+def update_cmake_target(filepath: str) -> bool:
+    """Point one CMakeLists.txt at the renamed library target."""
+    return replace_in_file(filepath, b'mmo_common', b'mmo_protocol')
+
+
+# The root CMakeLists.txt needs both the subdirectory and the target renamed
+ROOT_CMAKE_SUBS = {
+    b'add_subdirectory(src/common)': b'add_subdirectory(src/protocol)',
+    b'mmo_common': b'mmo_protocol',
+}
+_RE_ROOT_CMAKE = re.compile(b'|'.join(re.escape(old) for old in ROOT_CMAKE_SUBS))
 
 
-def update_cmake_common_to_protocol():
+def update_cmake_common_to_protocol(cmake_files: list[str]):
     """Update CMakeLists.txt references from common to protocol."""
     root_cmake = os.path.join(ROOT, 'CMakeLists.txt')
-    with open(root_cmake, 'r') as f:
-        content = f.read()
-    new_content = content.replace('add_subdirectory(src/common)', 'add_subdirectory(src/protocol)')
-    if new_content != content:
-        print(f"  Updated {os.path.relpath(root_cmake, ROOT)}")
-        with open(root_cmake, 'w') as f:
-            f.write(new_content)
+    if sub_in_file(root_cmake, _RE_ROOT_CMAKE, ROOT_CMAKE_SUBS):
+        log(f"  Updated {os.path.relpath(root_cmake, ROOT)}")
 
     # Rename the library target too
     proto_cmake = os.path.join(SRC, 'protocol', 'CMakeLists.txt')
-    if os.path.exists(proto_cmake):
-        with open(proto_cmake, 'r') as f:
-            content = f.read()
-        new_content = content.replace('mmo_common', 'mmo_protocol')
-        if new_content != content:
-            print(f"  Updated {os.path.relpath(proto_cmake, ROOT)}")
-            with open(proto_cmake, 'w') as f:
-                f.write(new_content)
+    if os.path.exists(proto_cmake) and update_cmake_target(proto_cmake):
+        log(f"  Updated {os.path.relpath(proto_cmake, ROOT)}")
 
     # Update all CMakeLists that reference mmo_common
-    for dirpath, _, filenames in os.walk(ROOT):
-        for f in filenames:
-            if f == 'CMakeLists.txt':
-                fpath = os.path.join(dirpath, f)
-                with open(fpath, 'r') as fh:
-                    content = fh.read()
-                new_content = content.replace('mmo_common', 'mmo_protocol')
-                if new_content != content and fpath != proto_cmake:
-                    print(f"  Updated {os.path.relpath(fpath, ROOT)}")
-                    with open(fpath, 'w') as fh:
-                        fh.write(new_content)
+    others = [fpath for fpath in cmake_files if fpath not in (root_cmake, proto_cmake)]
+    with ThreadPoolExecutor(max_workers=IO_WORKERS) as ex:
+        for fpath, changed in map_files(ex, update_cmake_target, others):
+            if changed:
+                log(f"  Updated {os.path.relpath(fpath, ROOT)}")
 
 
 # ---- Phase 2: Rewrite namespaces in each file ----
@@ -126,237 +267,256 @@ INNER_NAMESPACES = {
     'heightmap_generator', 'detail', 'CollisionLayers',
 }
 
+# Patterns used per namespace line of every source file, compiled once up front
+_RE_FWD_JPH = re.compile(r'^\s*namespace\s+(JPH)\s*\{')
+_RE_NS_COMPACT = re.compile(r'^\s*namespace\s+(mmo(?:::\w+)*)\s*\{\s*$')
+# Body of a forward declaration block: blank lines and one `class X;` / `struct X;` per line
+_RE_FWD_BODY = re.compile(r'(?:\s*(?:class|struct)[^\S\n]+\w+;[^\S\n]*\n)*\s*')
+_RE_CLOSE = re.compile(r'^(\s*)}\s*//\s*namespace\s+(\S+)\s*$')
+_RE_CLOSE_SUB = re.compile(r'}\s*//\s*namespace\s+\S+')
+_RE_ANY_NS_OPEN = re.compile(r'^\s*namespace\s+.*\{')
+_RE_ANY_NS_CLOSE = re.compile(r'^\s*\}\s*//\s*namespace')
+_RE_ORPHAN_MMO = re.compile(r'^\s*\}\s*//\s*namespace\s+mmo\s*$')
+
+# Whole lines that may open or close a namespace. Everything else in a file is
+# copied through untouched, so only these lines are handed to the patterns above;
+# the `open` group tells openers from closers so each only meets its own patterns.
+_RE_NS_LINE = re.compile(
+    r'^[^\S\n]*(?:(?P<open>namespace[^\S\n])|\}[^\S\n]*//[^\S\n]*namespace).*$',
+    re.MULTILINE,
+)
+
+
+def find_forward_block_close(content: str, pos: int):
+    """Locate the closing line of a forward declaration block opened just before pos.
+
+    A forward declaration block only contains blank lines and `class X;` /
+    `struct X;` lines up to the first line starting with `}`. Returns the
+    (start, end) span of that closing line, or None if the block has other content.
+    """
+    brace = content.find('}', pos)
+    if brace < 0:
+        return None
+    close_start = content.rfind('\n', 0, brace) + 1
+    if content[close_start:brace].strip():
+        # The first brace sits mid-line, so the block holds more than declarations
+        return None
+    if not _RE_FWD_BODY.fullmatch(content, pos, close_start):
+        return None
+    close_end = content.find('\n', brace)
+    if close_end < 0:
+        close_end = len(content)
+    return close_start, close_end
+
+
+def drop_line(parts: list[str], idx: int):
+    """Remove the line held in parts[idx] along with one line break.
+
+    Matches popping the line from a list of lines and rejoining: the break after
+    the line goes with it, or the one before it when it is the last line.
+    """
+    parts[idx] = ''
+    for i in range(idx + 1, len(parts)):
+        if parts[i]:
+            parts[i] = parts[i][1:]
+            return
+    for i in range(idx - 1, -1, -1):
+        if parts[i]:
+            parts[i] = parts[i][:-1]
+            return
+
+
+def file_sha256(filepath: str) -> str:
+    """Hash a file straight from its descriptor."""
+    with open(filepath, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def rewrite_file_namespaces(filepath: str, known_digest: str | None = None) -> tuple[str | None, str | None]:
+    """Rewrite namespace declarations in a file to match its directory.
+
+    Runs in a worker process, so instead of logging it returns a log line
+    when the file changed, along with the digest of the file as it was left.
+    Files whose digest still matches known_digest were handled by an earlier
+    run and are skipped.
+    """
+    # Skip main.cpp files - they don't have namespace declarations of their own
+    if os.path.basename(filepath) == 'main.cpp':
+        return None, None
+
+    digest = file_sha256(filepath)
+    if digest == known_digest:
+        return None, digest
 
-def rewrite_file_namespaces(filepath: str):
-    """Rewrite namespace declarations in a file to match its directory."""
     target_ns = path_to_namespace(filepath)
-    target_ns_parts = target_ns.split('::')
 
     with open(filepath, 'r') as f:
         content = f.read()
 
+    # Nothing to rewrite in files without any namespace declarations
+    if 'namespace' not in content:
+        return None, digest
+
     original = content
 
-    # Skip main.cpp files - they don't have namespace declarations of their own
-    basename = os.path.basename(filepath)
-    if basename == 'main.cpp':
-        return
-
-    lines = content.split('\n')
-    new_lines = []
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        stripped = line.strip()
-
-        # Handle forward declaration blocks like: namespace mmo::gpu { class X; }
-        # or namespace JPH { ... } - leave external namespaces alone
-        fwd_match = re.match(r'^namespace\s+(JPH)\s*\{', stripped)
-        if fwd_match:
-            new_lines.append(line)
-            i += 1
-            continue
+    # Nested `namespace mmo { namespace engine {` pairs are not merged here: the
+    # compact pattern also matches a bare `namespace mmo {`, so the outer line is
+    # rewritten to the target and the inner line is left as it is.
+    parts = []
+    prev = 0
+    # Namespace opens and closes in the output, and the parts holding a
+    # `} // namespace mmo` line that may turn out to be orphaned
+    ns_opens = 0
+    ns_closes = 0
+    orphans = []
 
-        # Match forward-declaration namespace blocks for our own code
-        # e.g., namespace mmo::gpu { class GPUDevice; }
-        fwd_block_match = re.match(r'^namespace\s+(mmo(?:::\w+)*)\s*\{$', stripped)
-        if fwd_block_match:
-            old_ns = fwd_block_match.group(1)
-            # Check if this is a forward declaration block (short, contains only fwd decls)
-            # Look ahead to find the closing brace
-            block_lines = [line]
-            j = i + 1
-            is_fwd_block = False
-            while j < len(lines):
-                block_lines.append(lines[j])
-                if lines[j].strip().startswith('}'):
-                    # Check if all inner lines are forward declarations or empty
-                    inner = [l.strip() for l in block_lines[1:-1] if l.strip()]
-                    if all(re.match(r'^(class|struct)\s+\w+;$', l) for l in inner):
-                        is_fwd_block = True
-                    break
-                j += 1
-
-            if is_fwd_block:
-                # Rewrite the forward declaration namespace
-                new_ns = remap_old_namespace(old_ns, target_ns)
-                new_lines.append(line.replace(f'namespace {old_ns}', f'namespace {new_ns}'))
-                # Copy inner lines as-is
-                for k in range(i + 1, j):
-                    new_lines.append(lines[k])
-                # Fix closing comment
-                closing = lines[j]
-                closing = re.sub(
-                    r'}\s*//\s*namespace\s+\S+',
-                    f'}} // namespace {new_ns}',
-                    closing
-                )
-                new_lines.append(closing)
-                i = j + 1
-                continue
+    def emit(out_line: str):
+        nonlocal ns_opens, ns_closes
+        if _RE_ANY_NS_OPEN.match(out_line):
+            ns_opens += 1
+        elif _RE_ANY_NS_CLOSE.match(out_line):
+            ns_closes += 1
+            if _RE_ORPHAN_MMO.match(out_line):
+                orphans.append(len(parts))
+        parts.append(out_line)
 
-        # Match opening namespace - compact style: namespace mmo::systems {
-        ns_compact = re.match(r'^namespace\s+(mmo(?:::\w+)*)\s*\{$', stripped)
-        if ns_compact:
-            old_ns = ns_compact.group(1)
-            # Check if this is an inner/organizational namespace
-            old_parts = old_ns.split('::')
-            last_part = old_parts[-1]
-            if last_part in INNER_NAMESPACES and old_ns != target_ns:
-                # This is a sub-namespace within the file, keep the inner part only
-                new_lines.append(line)
-                i += 1
+    for m in _RE_NS_LINE.finditer(content):
+        if m.start() < prev:
+            # Already copied as part of a forward declaration block
+            continue
+        parts.append(content[prev:m.start()])
+        prev = m.end()
+        line = m.group(0)
+
+        if m.group('open'):
+            # Leave external namespaces alone, e.g. namespace JPH { ... }
+            if 'JPH' in line and _RE_FWD_JPH.match(line):
+                emit(line)
                 continue
 
-            new_ns = remap_old_namespace(old_ns, target_ns)
-            new_line = line.replace(f'namespace {old_ns}', f'namespace {new_ns}')
-            new_lines.append(new_line)
-            i += 1
-            continue
+            # Match opening namespace - compact style: namespace mmo::systems {
+            ns_compact = _RE_NS_COMPACT.match(line)
+            if ns_compact:
+                old_ns = ns_compact.group(1)
+
+                # Forward-declaration namespace blocks for our own code
+                # e.g., namespace mmo::gpu { class GPUDevice; }
+                block_close = find_forward_block_close(content, m.end())
+                if block_close:
+                    close_start, close_end = block_close
+                    new_ns = remap_old_namespace(old_ns, target_ns)
+                    emit(line.replace(f'namespace {old_ns}', f'namespace {new_ns}'))
+                    # Copy inner lines as-is, then fix the closing comment
+                    parts.append(content[m.end():close_start])
+                    emit(_RE_CLOSE_SUB.sub(f'}} // namespace {new_ns}', content[close_start:close_end]))
+                    prev = close_end
+                    continue
 
-        # Match opening namespace - non-compact: namespace mmo {
-        # followed later by namespace engine {
-        ns_outer = re.match(r'^namespace\s+(mmo)\s*\{$', stripped)
-        if ns_outer:
-            # Look ahead to see if there's a nested namespace immediately (within a few lines)
-            inner_ns = None
-            inner_idx = None
-            for j in range(i + 1, min(i + 10, len(lines))):
-                inner_stripped = lines[j].strip()
-                if inner_stripped == '' or inner_stripped.startswith('//') or inner_stripped.startswith('/*'):
+                # Check if this is an inner/organizational namespace
+                last_part = old_ns.split('::')[-1]
+                if last_part in INNER_NAMESPACES and old_ns != target_ns:
+                    # This is a sub-namespace within the file, keep the inner part only
+                    emit(line)
                     continue
-                inner_match = re.match(r'^namespace\s+(\w+)\s*\{$', inner_stripped)
-                if inner_match:
-                    candidate = inner_match.group(1)
-                    if candidate not in INNER_NAMESPACES:
-                        inner_ns = candidate
-                        inner_idx = j
-                break
-
-            if inner_ns:
-                # Merge into compact namespace: namespace mmo::engine -> target_ns
-                old_ns = f'mmo::{inner_ns}'
+
                 new_ns = remap_old_namespace(old_ns, target_ns)
-                indent = line[:len(line) - len(line.lstrip())]
-                new_lines.append(f'{indent}namespace {new_ns} {{')
-                # Skip lines between outer and inner opening
-                # But preserve any forward declarations / comments between them
-                for k in range(i + 1, inner_idx):
-                    fwd_line = lines[k].strip()
-                    if fwd_line and not fwd_line.startswith('//'):
-                        # Forward declarations that were in the outer namespace
-                        # but before the inner - these need to move or be qualified
-                        new_lines.append(lines[k])
-                # Skip the inner namespace line itself
-                i = inner_idx + 1
-                continue
-            else:
-                # Plain namespace mmo { with no inner namespace
-                new_ns = target_ns
-                new_line = line.replace('namespace mmo', f'namespace {new_ns}')
-                new_lines.append(new_line)
-                i += 1
+                emit(line.replace(f'namespace {old_ns}', f'namespace {new_ns}'))
                 continue
+        else:
+            # Match closing namespace comments
+            close_match = _RE_CLOSE.match(line)
+            if close_match:
+                indent = close_match.group(1)
+                old_ns = close_match.group(2)
+
+                # Check if this is an inner namespace
+                if old_ns.split('::')[-1] in INNER_NAMESPACES:
+                    emit(line)
+                    continue
 
-        # Match closing namespace comments
-        close_match = re.match(r'^(\s*)}\s*//\s*namespace\s+(\S+)\s*$', line)
-        if close_match:
-            indent = close_match.group(1)
-            old_ns = close_match.group(2)
-
-            # Check if this is an inner namespace
-            old_parts = old_ns.split('::')
-            if old_parts[-1] in INNER_NAMESPACES:
-                new_lines.append(line)
-                i += 1
+                new_ns = remap_old_namespace(old_ns, target_ns)
+                emit(f'{indent}}} // namespace {new_ns}')
                 continue
 
-            new_ns = remap_old_namespace(old_ns, target_ns)
-            new_lines.append(f'{indent}}} // namespace {new_ns}')
-            i += 1
-            continue
+        emit(line)
 
-        # Match closing of merged nested namespace (e.g. "} // namespace engine" that
-        # was the inner part of a nested pair - needs to become the target closing)
-        close_inner = re.match(r'^(\s*)}\s*//\s*namespace\s+(\w+)\s*$', line)
-        if close_inner:
-            ns_name = close_inner.group(2)
-            indent = close_inner.group(1)
-            if ns_name in ('engine', 'gpu', 'systems', 'ecs', 'config'):
-                # This was the inner namespace of a nested pair
-                new_lines.append(f'{indent}}} // namespace {target_ns}')
-                i += 1
-                continue
+    parts.append(content[prev:])
 
-        new_lines.append(line)
-        i += 1
+    # Now handle the case where the file ends up with more closing comments than
+    # openers, leaving an orphaned `} // namespace mmo` - usually at the end.
+    while ns_closes > ns_opens and orphans:
+        drop_line(parts, orphans.pop())
+        ns_closes -= 1
 
-    content = '\n'.join(new_lines)
+    content = ''.join(parts)
 
-    # Now handle the case where we merged nested namespaces but left an extra
-    # closing brace for the outer `namespace mmo {`
-    # After merging `namespace mmo { ... namespace engine {` into `namespace mmo::engine {`,
-    # there will be an orphaned `} // namespace mmo` at the end.
-    content = remove_orphaned_outer_close(content, target_ns)
+    if content == original:
+        return None, digest
+    with open(filepath, 'w') as f:
+        f.write(content)
+    return f"  Rewrote namespaces: {os.path.relpath(filepath, ROOT)}", file_sha256(filepath)
 
-    if content != original:
-        print(f"  Rewrote namespaces: {os.path.relpath(filepath, ROOT)}")
-        with open(filepath, 'w') as f:
-            f.write(content)
 
+def load_refactor_cache(script_digest: str) -> dict[str, str]:
+    """Load the digests recorded by the last run, keyed by path relative to the repo root.
 
+    The digests only say the file was already handled by the rules of the
+    script that recorded them, so they are all dropped once the script changes.
+    """
+    try:
+        with open(CACHE_PATH, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get('script') != script_digest:
+        return {}
+    return cache.get('files', {})
+
+
+def rewrite_all_namespaces(sources: list[str]):
+    """Rewrite namespace declarations in every source file not already handled."""
+    script_digest = file_sha256(__file__)
+    cache = load_refactor_cache(script_digest)
+    known = [cache.get(os.path.relpath(filepath, ROOT)) for filepath in sources]
+    skipped = 0
+
+    # Each file is rewritten independently, so spread them across cores.
+    # The cache is saved even if a file fails, so the ones already rewritten
+    # are not redone on the next run.
+    try:
+        with ProcessPoolExecutor() as ex:
+            for filepath, (msg, digest) in map_files(ex, rewrite_file_namespaces, sources, known):
+                key = os.path.relpath(filepath, ROOT)
+                if msg:
+                    log(msg)
+                elif digest and digest == cache.get(key):
+                    skipped += 1
+                if digest:
+                    cache[key] = digest
+    finally:
+        if skipped:
+            log(f"  Skipped {skipped} files unchanged since the last run (delete {os.path.basename(CACHE_PATH)} to redo them)")
+
+        with open(CACHE_PATH, 'w') as f:
+            json.dump({'script': script_digest, 'files': cache}, f, indent=2, sort_keys=True)
+
+
+@functools.lru_cache(maxsize=256)
 def remap_old_namespace(old_ns: str, target_ns: str) -> str:
     """Map an old namespace to the new target based on directory structure."""
-    # Direct mappings for known old namespaces
-    mappings = {
-        'mmo': target_ns,
-        'mmo::engine': target_ns if 'engine' in target_ns else target_ns,
-        'mmo::gpu': target_ns.replace('mmo::engine', 'mmo::engine::gpu') if 'engine' in target_ns else 'mmo::engine::gpu',
-        'mmo::systems': target_ns,
-        'mmo::ecs': target_ns,
-        'mmo::config': target_ns,
-    }
-
-    if old_ns in mappings:
-        return mappings[old_ns]
-
-    # For namespaces that already match the target pattern, keep as-is
-    if old_ns == target_ns:
-        return target_ns
-
+    # Every known old namespace (mmo, mmo::engine, mmo::systems, mmo::ecs,
+    # mmo::config) and anything else maps straight to the target - except
+    # the old gpu namespace, which moves under engine.
+    if old_ns == 'mmo::gpu':
+        if 'engine' in target_ns:
+            return target_ns.replace('mmo::engine', 'mmo::engine::gpu')
+        return 'mmo::engine::gpu'
     return target_ns
 
 
-def remove_orphaned_outer_close(content: str, target_ns: str) -> str:
-    """Remove orphaned } // namespace mmo lines left after merging nested namespaces."""
-    lines = content.split('\n')
-    # Count namespace opens and closes
-    ns_opens = 0
-    ns_closes = 0
-    to_remove = []
-
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        if re.match(r'^namespace\s+', stripped) and '{' in stripped:
-            ns_opens += 1
-        if re.match(r'^\}\s*//\s*namespace', stripped):
-            ns_closes += 1
-
-    if ns_closes > ns_opens:
-        # Find the orphaned close - it's usually `} // namespace mmo` at the end
-        for i in range(len(lines) - 1, -1, -1):
-            if re.match(r'^\}\s*//\s*namespace\s+mmo\s*$', lines[i].strip()):
-                lines.pop(i)
-                ns_closes -= 1
-                if ns_closes == ns_opens:
-                    break
-
-    return '\n'.join(lines)
-
-
 # ---- Phase 3: Update qualified name references ----
 
-def update_cross_references():
+def update_cross_references(sources: list[str]):
     """Update qualified references like engine::Application, systems::PhysicsSystem, etc."""
     replacements_by_context = {
         # In client files, references to engine types need engine:: prefix to still work
@@ -377,8 +537,8 @@ def update_cross_references():
         ],
     }
 
-    for filepath in get_all_sources():
-        rel = os.path.relpath(filepath, SRC).replace('\\', '/')
+    for filepath in sources:
+        rel = src_relpath(filepath).replace('\\', '/')
         parts = rel.split('/')
         if not parts:
             continue
@@ -401,7 +561,7 @@ def update_cross_references():
             pass
 
         if content != original:
-            print(f"  Updated references: {os.path.relpath(filepath, ROOT)}")
+            log(f"  Updated references: {os.path.relpath(filepath, ROOT)}")
             with open(filepath, 'w') as f:
                 f.write(content)
 
@@ -424,28 +584,36 @@ def add_using_declarations():
 # ---- Main ----
 
 def main():
-    print("=" * 60)
-    print("MMO-4 Namespace Refactoring")
-    print("=" * 60)
-
-    print("\n--- Phase 1: Rename common -> protocol ---")
-    rename_common_to_protocol()
-    update_includes_common_to_protocol()
-    update_cmake_common_to_protocol()
-
-    print("\n--- Phase 2: Rewrite namespace declarations ---")
-    for filepath in get_all_sources():
-        rewrite_file_namespaces(filepath)
-
-    print("\n--- Phase 3: Update cross-references ---")
-    update_cross_references()
-
-    print("\n--- Done ---")
-    print("Run a build to find remaining issues that need manual fixes.")
-    print("Common issues will be:")
-    print("  - Types referenced across namespace boundaries need full qualification")
-    print("  - Forward declarations may need namespace updates")
-    print("  - using declarations may be needed in some files")
+    # Whatever happens, report what was logged so far: a failed run still
+    # shows which files it already changed on disk
+    try:
+        log("=" * 60)
+        log("MMO-4 Namespace Refactoring")
+        log("=" * 60)
+
+        log("\n--- Phase 1: Rename common -> protocol ---")
+        rename_common_to_protocol()
+        sources, cmake_files = get_all_files()
+        update_includes_common_to_protocol(sources)
+        update_cmake_common_to_protocol(cmake_files)
+        flush_log()
+
+        log("\n--- Phase 2: Rewrite namespace declarations ---")
+        rewrite_all_namespaces(sources)
+        flush_log()
+
+        log("\n--- Phase 3: Update cross-references ---")
+        update_cross_references(sources)
+        flush_log()
+
+        log("\n--- Done ---")
+        log("Run a build to find remaining issues that need manual fixes.")
+        log("Common issues will be:")
+        log("  - Types referenced across namespace boundaries need full qualification")
+        log("  - Forward declarations may need namespace updates")
+        log("  - using declarations may be needed in some files")
+    finally:
+        flush_log()
 
 
 if __name__ == '__main__':
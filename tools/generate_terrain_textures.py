@@ -10,44 +10,47 @@ Generate placeholder terrain textures for the multi-texture terrain system.
 Creates dirt, rock, sand textures and a default splatmap.
 """
 
-from PIL import Image, ImageDraw
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
 import numpy as np
 import os
 
-def create_simple_texture(width, height, base_color, noise_amount=0.1):
-    """Create a simple texture with color variation."""
-    img = Image.new('RGB', (width, height))
-    pixels = []
+# Noise textures to generate: (filename, base color, noise amount)
+NOISE_TEXTURES = [
+    ("grass_seamless.png", (75, 140, 60), 0.15),    # green
+    ("dirt_seamless.png", (139, 90, 43), 0.15),     # brown
+    ("rock_seamless.png", (128, 128, 128), 0.2),    # gray
+    ("sand_seamless.png", (238, 214, 175), 0.1),    # tan/yellow
+]
 
-    for y in range(height):
-        for x in range(width):
-            # Add some noise for variation
-            r = int(base_color[0] * (1.0 + np.random.uniform(-noise_amount, noise_amount)))
-            g = int(base_color[1] * (1.0 + np.random.uniform(-noise_amount, noise_amount)))
-            b = int(base_color[2] * (1.0 + np.random.uniform(-noise_amount, noise_amount)))
+def create_simple_texture(width, height, base_color, noise_amount=0.1, rng=None):
+    """Create a simple texture with color variation, drawing noise from rng."""
+    if rng is None:
+        rng = np.random.default_rng()
 
-            # Clamp values
-            r = max(0, min(255, r))
-            g = max(0, min(255, g))
-            b = max(0, min(255, b))
+    # Add some noise for variation, drawn for every channel of every pixel at once
+    noise = rng.uniform(-noise_amount, noise_amount, (height, width, 3))
+    pixels = np.asarray(base_color, dtype=np.float64) * (1.0 + noise)
 
-            pixels.append((r, g, b))
+    # Clamp values
+    pixels = np.clip(pixels, 0, 255).astype(np.uint8)
 
-    img.putdata(pixels)
-    return img
+    return Image.fromarray(pixels, 'RGB')
 
 def create_default_splatmap(width, height):
     """Create default splatmap - all grass (R=255, G=B=A=0)."""
-    img = Image.new('RGBA', (width, height))
-    pixels = []
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    pixels[..., 0] = 255
 
-    for y in range(height):
-        for x in range(width):
-            # All grass by default
-            pixels.append((255, 0, 0, 0))
+    return Image.fromarray(pixels, 'RGBA')
 
-    img.putdata(pixels)
-    return img
+def save_noise_texture(path, size, base_color, noise_amount, rng):
+    """Create a noise texture and save it. Runs on a worker thread."""
+    create_simple_texture(size, size, base_color, noise_amount, rng).save(path)
+
+def save_default_splatmap(path, size):
+    """Create the default splatmap and save it. Runs on a worker thread."""
+    create_default_splatmap(size, size).save(path)
 
 def main():
     # Create output directory if needed
@@ -58,31 +61,27 @@ def main():
 
     # Texture size
     size = 512
-
-    # Create grass texture (green)
-    print("  Creating grass_seamless.png...")
-    grass = create_simple_texture(size, size, (75, 140, 60), noise_amount=0.15)
-    grass.save(os.path.join(output_dir, "grass_seamless.png"))
-
-    # Create dirt texture (brown)
-    print("  Creating dirt_seamless.png...")
-    dirt = create_simple_texture(size, size, (139, 90, 43), noise_amount=0.15)
-    dirt.save(os.path.join(output_dir, "dirt_seamless.png"))
-
-    # Create rock texture (gray)
-    print("  Creating rock_seamless.png...")
-    rock = create_simple_texture(size, size, (128, 128, 128), noise_amount=0.2)
-    rock.save(os.path.join(output_dir, "rock_seamless.png"))
-
-    # Create sand texture (tan/yellow)
-    print("  Creating sand_seamless.png...")
-    sand = create_simple_texture(size, size, (238, 214, 175), noise_amount=0.1)
-    sand.save(os.path.join(output_dir, "sand_seamless.png"))
-
-    # Create default splatmap (1024x1024 for higher resolution control)
-    print("  Creating terrain_splatmap.png (1024x1024)...")
-    splatmap = create_default_splatmap(1024, 1024)
-    splatmap.save(os.path.join(output_dir, "terrain_splatmap.png"))
+    # One independent generator per texture; Generators are not shared between threads
+    rngs = [np.random.default_rng(seed) for seed in np.random.SeedSequence().spawn(len(NOISE_TEXTURES))]
+
+    # Every texture is independent, so generate and encode them in parallel.
+    # NumPy and PIL release the GIL for the heavy lifting, so threads are
+    # enough and skip the cost of starting worker processes.
+    with ThreadPoolExecutor(len(NOISE_TEXTURES) + 1) as executor:
+        futures = []
+        for (filename, base_color, noise_amount), rng in zip(NOISE_TEXTURES, rngs):
+            print(f"  Creating {filename}...")
+            futures.append(executor.submit(save_noise_texture, os.path.join(output_dir, filename),
+                                           size, base_color, noise_amount, rng))
+
+        # Create default splatmap (1024x1024 for higher resolution control)
+        print("  Creating terrain_splatmap.png (1024x1024)...")
+        futures.append(executor.submit(save_default_splatmap,
+                                       os.path.join(output_dir, "terrain_splatmap.png"), 1024))
+
+        # Surface any failure from the workers
+        for future in futures:
+            future.result()
 
     print("\n✓ All textures created successfully!")
     print(f"  Location: {os.path.abspath(output_dir)}")